@@ -0,0 +1,140 @@
+# SentinelOneX Ingest Admission Control
+# Token-bucket rate limits (per agent and global) and load shedding for /ingest.
+# Rejections carry a Retry-After hint that agents honor to back off smoothly.
+import math
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+# --- Configuration ---
+AGENT_RATE_PER_SECOND = 0.2        # Sustained ingests per agent (one per 5s)
+AGENT_BURST = 4                    # Ingests an agent may send back-to-back
+# Before the body is read, clients that don't send X-Agent-ID (older agents, possibly many behind one
+# NAT/proxy, and the dashboard's sample telemetry) or claim an agent id with no bucket yet share a bucket
+# per source IP; once parsed, the payload's agent_id is charged to its agent bucket, creating it. So only
+# verified agent ids get buckets, and random headers can't crowd real agents out.
+CLIENT_IP_RATE_PER_SECOND = 5.0
+CLIENT_IP_BURST = 50
+GLOBAL_RATE_PER_SECOND = 200.0     # Sustained ingests across the whole fleet
+GLOBAL_BURST = 400
+MAX_TRACKED_AGENTS = 50_000        # Least recently seen agent buckets are evicted beyond this
+MAX_INGEST_BYTES = 8 * 1024 * 1024 # Largest accepted /ingest body
+INGEST_READ_TIMEOUT_SECONDS = 10.0 # Slow uploads are cut off with 408 after this
+MAX_INFLIGHT_INGESTS = 64          # Concurrent ingests (body read, being processed) before shedding with 503
+SHED_LATENCY_SECONDS = 2.0         # Smoothed processing time (after the body is read) before shedding
+LATENCY_SMOOTHING = 0.2            # Weight of the newest sample in the latency average
+LATENCY_HALF_LIFE_SECONDS = 5.0    # Latency average decays while no ingests complete
+# Retry-After hints are never shorter than the agents' collection interval (so they actually slow
+# down), and grow with how far past the shedding thresholds the server is.
+AGENT_COLLECTION_INTERVAL_SECONDS = 15
+MAX_RETRY_AFTER_SECONDS = 300
+
+
+class TokenBucket:
+    """Classic token bucket; refills continuously at `rate` tokens per second up to `burst`."""
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, now: float) -> float:
+        """Takes a token if available. Returns 0, or the seconds until one will be."""
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def give_back(self):
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class AdmissionController:
+    """Decides whether an ingest may proceed, before its body is read."""
+
+    def __init__(self):
+        now = time.monotonic()
+        self.global_bucket = TokenBucket(GLOBAL_RATE_PER_SECOND, GLOBAL_BURST, now)
+        self.agent_buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.inflight = 0
+        self.latency = 0.0
+        self.latency_updated = now
+
+    def _bucket(self, key: str, rate: float, burst: float, now: float) -> TokenBucket:
+        bucket = self.agent_buckets.get(key)
+        if bucket is None:
+            bucket = self.agent_buckets[key] = TokenBucket(rate, burst, now)
+            if len(self.agent_buckets) > MAX_TRACKED_AGENTS:
+                self.agent_buckets.popitem(last=False)
+        else:
+            self.agent_buckets.move_to_end(key)
+        return bucket
+
+    def _smoothed_latency(self, now: float) -> float:
+        return self.latency * 0.5 ** ((now - self.latency_updated) / LATENCY_HALF_LIFE_SECONDS)
+
+    @staticmethod
+    def _retry_after(seconds: float) -> int:
+        return min(max(math.ceil(seconds), AGENT_COLLECTION_INTERVAL_SECONDS), MAX_RETRY_AFTER_SECONDS)
+
+    def is_tracked(self, agent_id: Optional[str]) -> bool:
+        """Whether `agent_id` already has a bucket, i.e. has been verified against a parsed payload."""
+        return agent_id is not None and agent_id in self.agent_buckets
+
+    def admit(self, agent_id: Optional[str], client_ip: str) -> Optional[Tuple[int, int, str]]:
+        """
+        Returns None if admitted, else (status_code, retry_after_seconds, reason).
+        `agent_id` is a tracked X-Agent-ID, or None to fall back to the client IP.
+        """
+        now = time.monotonic()
+        overload = max(self.inflight / MAX_INFLIGHT_INGESTS, self._smoothed_latency(now) / SHED_LATENCY_SECONDS)
+        if overload >= 1:
+            return 503, self._retry_after(AGENT_COLLECTION_INTERVAL_SECONDS * overload), \
+                "Server overloaded, shedding load"
+
+        if agent_id is None:
+            bucket = self._bucket(f"ip:{client_ip}", CLIENT_IP_RATE_PER_SECOND, CLIENT_IP_BURST, now)
+            limited = f"client {client_ip}"
+        else:
+            bucket = self._bucket(agent_id, AGENT_RATE_PER_SECOND, AGENT_BURST, now)
+            limited = f"agent {agent_id}"
+        wait = bucket.try_take(now)
+        if wait:
+            return 429, self._retry_after(wait), f"Rate limit exceeded for {limited}"
+
+        wait = self.global_bucket.try_take(now)
+        if wait:
+            # Don't charge the client for an ingest that was rejected globally
+            bucket.give_back()
+            return 429, self._retry_after(wait), "Global ingest rate limit exceeded"
+        return None
+
+    def charge_agent(self, agent_id: str) -> Optional[Tuple[int, int, str]]:
+        """Charges a parsed payload's agent_id to its bucket (for clients admitted by IP)."""
+        now = time.monotonic()
+        wait = self._bucket(agent_id, AGENT_RATE_PER_SECOND, AGENT_BURST, now).try_take(now)
+        if wait:
+            return 429, self._retry_after(wait), f"Rate limit exceeded for agent {agent_id}"
+        return None
+
+    def started(self):
+        """Counts an ingest as in flight once its body has been read."""
+        self.inflight += 1
+
+    def finished(self, elapsed: Optional[float]):
+        """Ends an admitted ingest; `elapsed` is its processing time, or None if it never got that far."""
+        if elapsed is None:
+            self.inflight -= 1
+            return
+        now = time.monotonic()
+        current = self._smoothed_latency(now)
+        self.latency = current + LATENCY_SMOOTHING * (elapsed - current)
+        self.latency_updated = now
+        self.inflight -= 1
@@ -0,0 +1,361 @@
+# SentinelOneX Behavioral Baselines
+# Learns what "normal" looks like for each agent (process names, parent/cmdline
+# shapes, listening ports, remote endpoints) and reports items never seen before.
+import base64
+import hashlib
+import json
+import re
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Iterable, Set, Tuple
+
+from telemetry import ProcessTable, ConnectionTable
+
+# --- Configuration ---
+BLOOM_BITS = 1 << 16                 # 8 KB per filter generation
+BLOOM_HASHES = 7                     # <0.1% false positives with a full generation plus carry-over
+GENERATION_CAPACITY = 2048           # New items before the current generation is rotated out
+GENERATION_MAX_AGE_SECONDS = 7 * 24 * 3600  # Items not seen for ~2 weeks are forgotten
+MAX_ITEMS_PER_CATEGORY = 2048        # Cap on items tracked per snapshot per category
+BASELINE_WARMUP_SNAPSHOTS = 4        # Snapshots to learn from before alerting
+MAX_EVIDENCE_ITEMS = 20              # Novel items listed in a single alert
+CMDLINE_SHAPE_MAX_LENGTH = 200
+MAX_RESIDENT_BASELINES = 2048        # Least recently seen baselines are unloaded beyond this (~64 KB each)
+BASELINE_FILENAME = "baseline.json"  # Stored in each agent's data directory
+
+FEATURE_CATEGORIES = ("process", "process_shape", "listening_port", "remote_endpoint")
+
+ALERT_TEMPLATES = {
+    "process": ("New Process Observed", "low",
+                "Process name(s) never seen before on this host."),
+    "process_shape": ("New Process Lineage Observed", "low",
+                      "Parent/command-line combination(s) never seen before on this host."),
+    "listening_port": ("New Listening Port Observed", "medium",
+                       "Port(s) opened for listening that were never seen before on this host."),
+    "remote_endpoint": ("New Remote Endpoint Observed", "low",
+                        "Process(es) connecting out on a remote port never seen before for them on this host."),
+}
+
+_NUMBER_RE = re.compile(r"\b[0-9a-f]{8,}\b|\d+")
+_LOOPBACK_PREFIXES = ("127.", "::1", "[::1]")
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, using double hashing."""
+    __slots__ = ("bits", "mask", "num_hashes")
+
+    def __init__(self, num_bits: int = BLOOM_BITS, num_hashes: int = BLOOM_HASHES):
+        # num_bits must be a power of two so positions can be masked instead of taken modulo
+        self.bits = bytearray(num_bits // 8)
+        self.mask = num_bits - 1
+        self.num_hashes = num_hashes
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # A stable digest (unlike the per-process salted hash()) keeps persisted filters valid across restarts
+        h = int.from_bytes(hashlib.blake2b(item.encode("utf-8", "surrogatepass"), digest_size=8).digest(), "little")
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return ((h1 + i * h2) & self.mask for i in range(self.num_hashes))
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def to_text(self) -> str:
+        return base64.b64encode(self.bits).decode("ascii")
+
+    @classmethod
+    def from_text(cls, text: str) -> "BloomFilter":
+        bloom = cls()
+        bits = base64.b64decode(text)
+        if len(bits) != len(bloom.bits):
+            raise ValueError("filter size does not match BLOOM_BITS")
+        bloom.bits[:] = bits
+        return bloom
+
+
+class AgingBloomSet:
+    """
+    Two-generation Bloom filter. Items are added to the current generation and
+    looked up in both; once the current generation is full or too old it becomes
+    the previous one, so items that stop showing up are eventually forgotten.
+    """
+    __slots__ = ("current", "previous", "count", "started_at")
+
+    def __init__(self):
+        self.current = BloomFilter()
+        self.previous = BloomFilter()
+        self.count = 0
+        self.started_at = None
+
+    def needs_rotation(self, now: float) -> bool:
+        if self.started_at is None:
+            return False
+        return self.count >= GENERATION_CAPACITY or now - self.started_at >= GENERATION_MAX_AGE_SECONDS
+
+    def rotate(self, now: float, carry_over: Iterable[str] = ()):
+        """
+        Starts a new generation seeded with `carry_over` (items still present).
+        Carried items don't count toward capacity, or a large snapshot would
+        force a rotation on every update.
+        """
+        self.previous = self.current
+        self.current = BloomFilter()
+        for item in carry_over:
+            self.current.add(item)
+        self.count = 0
+        self.started_at = now
+
+    def observe(self, item: str, now: float) -> bool:
+        """
+        Records a sighting of `item` and returns True if it is novel. Items
+        found only in the previous generation are re-added to the current one,
+        so ones that recur intermittently are not forgotten at the next rotation.
+        """
+        if item in self.current:
+            return False
+        if self.started_at is None:
+            self.started_at = now
+        self.current.add(item)
+        self.count += 1
+        return item not in self.previous
+
+    def __contains__(self, item: str) -> bool:
+        return item in self.current or item in self.previous
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "current": self.current.to_text(),
+            "previous": self.previous.to_text(),
+            "count": self.count,
+            "started_at": self.started_at
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "AgingBloomSet":
+        known = cls()
+        known.current = BloomFilter.from_text(state["current"])
+        known.previous = BloomFilter.from_text(state["previous"])
+        known.count = int(state["count"])
+        known.started_at = state["started_at"]
+        return known
+
+
+def cmdline_shape(cmdline: str) -> str:
+    """Reduces a command line to its shape: lowercased, with numbers and hex ids masked."""
+    return sys.intern(_NUMBER_RE.sub("#", cmdline.lower())[:CMDLINE_SHAPE_MAX_LENGTH])
+
+
+def _port_of(address: str) -> str:
+    return address.rsplit(":", 1)[-1]
+
+
+def extract_features(processes: ProcessTable, connections: ConnectionTable,
+                     lineage_cache: Dict[Tuple, str]) -> Dict[str, Set[str]]:
+    """
+    Extracts the baseline feature sets from a telemetry snapshot. `lineage_cache`
+    maps the agent's recent (parent, name, cmdline) rows to their lineage keys and
+    is topped up with this snapshot's, so only rows that are new get shaped.
+    """
+    features = {category: set() for category in FEATURE_CATEGORIES}
+
+    names = processes.name_lower
+    features["process"].update(names)
+    features["process"].discard("")
+    names_by_pid = dict(zip(processes.pid, names))
+    # Most (parent, name, cmdline) rows were in the previous snapshot too, so rows are looked up
+    # column-wise and only uncached ones are visited below.
+    rows = list(zip(map(names_by_pid.get, processes.ppid), names, processes.cmdline_text))
+    lineages = list(map(lineage_cache.get, rows))
+    uncached = lineages.count(None)
+    if uncached:
+        if len(lineage_cache) + uncached > MAX_ITEMS_PER_CATEGORY:
+            lineage_cache.clear() # Drop rows of older snapshots wholesale
+        shapes = {}
+        for i, row in enumerate(rows):
+            if lineages[i] is not None:
+                continue
+            lineage = lineage_cache.get(row) # A repeat of an earlier row of this snapshot
+            if lineage is not None:
+                lineages[i] = lineage
+                continue
+            parent, name, cmdline = row
+            lineage = "" # Rows without a name are cached too, but not a feature
+            if name:
+                shape = ""
+                if cmdline:
+                    shape = shapes.get(cmdline)
+                    if shape is None:
+                        shape = shapes[cmdline] = cmdline_shape(cmdline)
+                lineage = f"{parent or ''}>{name} {shape}"
+            lineages[i] = lineage
+            if len(lineage_cache) < MAX_ITEMS_PER_CATEGORY:
+                lineage_cache[row] = lineage
+    features["process_shape"].update(lineages)
+    features["process_shape"].discard("")
+
+    # Remote endpoints are keyed by owning process and remote port (the "service") rather than the
+    # exact address, since CDN/cloud peers rotate IPs across many networks within minutes.
+    statuses = connections.status
+    features["listening_port"].update(
+        _port_of(local) for local, status in zip(connections.local_address, statuses)
+        if status == "LISTEN" and local
+    )
+    features["remote_endpoint"].update(
+        f"{names_by_pid.get(pid) or 'unknown'}->{_port_of(remote)}"
+        for remote, status, pid in zip(connections.remote_address, statuses, connections.pid)
+        if remote and (status == "ESTABLISHED" or status is None) and not remote.startswith(_LOOPBACK_PREFIXES)
+    )
+    # Older payloads (e.g. the dashboard's sample telemetry) use local_port/remote_ip/remote_port
+    for i, extra in connections.extras.items():
+        status = statuses[i]
+        if status == "LISTEN" and not connections.local_address[i] and extra.get("local_port") is not None:
+            features["listening_port"].add(str(extra["local_port"]))
+        elif (status == "ESTABLISHED" or status is None) and connections.remote_address[i] is None \
+                and extra.get("remote_ip"):
+            remote = f"{extra['remote_ip']}:{extra.get('remote_port')}"
+            if not remote.startswith(_LOOPBACK_PREFIXES):
+                owner = names_by_pid.get(connections.pid[i]) or "unknown"
+                features["remote_endpoint"].add(f"{owner}->{_port_of(remote)}")
+
+    for category, items in features.items():
+        if len(items) > MAX_ITEMS_PER_CATEGORY:
+            features[category] = set(sorted(items)[:MAX_ITEMS_PER_CATEGORY])
+    return features
+
+
+class AgentBaseline:
+    """The learned baseline for a single agent, with a fixed memory footprint."""
+    __slots__ = ("snapshots_seen", "known", "last_snapshot", "lineages", "dirty")
+
+    def __init__(self):
+        self.snapshots_seen = 0
+        self.dirty = False # Changed since it was last persisted
+        self.lineages: Dict[Tuple, str] = {}
+        self.known = {category: AgingBloomSet() for category in FEATURE_CATEGORIES}
+        self.last_snapshot: Dict[str, Set[str]] = {category: set() for category in FEATURE_CATEGORIES}
+
+    def update(self, features: Dict[str, Set[str]], now: float) -> Dict[str, List[str]]:
+        """
+        Folds a snapshot into the baseline and returns the items that were novel.
+        Only items that changed since the previous snapshot are looked up.
+        """
+        novel = {}
+        for category in FEATURE_CATEGORIES:
+            items = features.get(category, set())
+            known = self.known[category]
+            previous = self.last_snapshot[category]
+
+            if known.needs_rotation(now):
+                # Keep items that are still present alive across the rotation
+                known.rotate(now, carry_over=previous)
+                self.dirty = True
+
+            added = known.count
+            new_items = [item for item in items - previous if known.observe(item, now)]
+            if known.count != added:
+                self.dirty = True
+            if new_items:
+                novel[category] = sorted(new_items)
+            self.last_snapshot[category] = items
+
+        self.snapshots_seen += 1
+        if self.snapshots_seen <= BASELINE_WARMUP_SNAPSHOTS + 1:
+            self.dirty = True # Persist warm-up progress so a restart doesn't start learning over
+        return novel
+
+    @property
+    def learning(self) -> bool:
+        return self.snapshots_seen <= BASELINE_WARMUP_SNAPSHOTS
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The persistent part of the baseline; the per-snapshot memos are rebuilt on the next update."""
+        return {
+            "snapshots_seen": self.snapshots_seen,
+            "known": {category: known.to_dict() for category, known in self.known.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "AgentBaseline":
+        baseline = cls()
+        baseline.snapshots_seen = int(state["snapshots_seen"])
+        for category in FEATURE_CATEGORIES:
+            baseline.known[category] = AgingBloomSet.from_dict(state["known"][category])
+        return baseline
+
+
+class BaselineStore:
+    """
+    Holds the baselines of recently seen agents in memory and turns deviations
+    into alerts. Each baseline is persisted to `data_dir/<agent_id>/` whenever
+    it changes, so restarts and other ingest nodes pick up where it left off.
+    """
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = data_dir
+        self.baselines: "OrderedDict[str, AgentBaseline]" = OrderedDict()
+
+    def _path(self, agent_id: str) -> Path:
+        return self.data_dir / agent_id / BASELINE_FILENAME
+
+    def _load(self, agent_id: str) -> AgentBaseline:
+        path = self._path(agent_id)
+        if path.exists():
+            try:
+                return AgentBaseline.from_dict(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"Warning: Could not load baseline for {agent_id}, relearning it: {e}")
+        return AgentBaseline()
+
+    def save(self, agent_id: str, baseline: AgentBaseline):
+        path = self._path(agent_id)
+        temp_path = path.with_suffix(".tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path.write_text(json.dumps(baseline.to_dict()), encoding="utf-8")
+            temp_path.replace(path) # Atomic, so a crash never leaves a half-written baseline
+            baseline.dirty = False
+        except OSError as e:
+            print(f"Warning: Could not persist baseline for {agent_id}: {e}")
+
+    def get(self, agent_id: str) -> AgentBaseline:
+        baseline = self.baselines.get(agent_id)
+        if baseline is None:
+            baseline = self.baselines[agent_id] = self._load(agent_id)
+            if len(self.baselines) > MAX_RESIDENT_BASELINES:
+                evicted_id, evicted = self.baselines.popitem(last=False)
+                if evicted.dirty:
+                    self.save(evicted_id, evicted)
+        else:
+            self.baselines.move_to_end(agent_id)
+        return baseline
+
+    def evaluate(self, agent_id: str, processes: ProcessTable, connections: ConnectionTable) -> List[Dict]:
+        baseline = self.get(agent_id)
+        features = extract_features(processes, connections, baseline.lineages)
+        # Server time, so a misconfigured agent clock can't stall or race generation rotation
+        novel = baseline.update(features, time.time())
+        if baseline.dirty:
+            self.save(agent_id, baseline)
+        if baseline.learning:
+            return []
+
+        alerts = []
+        for category, items in novel.items():
+            title, severity, description = ALERT_TEMPLATES[category]
+            alerts.append({
+                "title": title,
+                "description": description,
+                "severity": severity,
+                "evidence": {
+                    "agent_id": agent_id,
+                    "category": category,
+                    "new_items": items[:MAX_EVIDENCE_ITEMS],
+                    "new_item_count": len(items)
+                }
+            })
+        return alerts
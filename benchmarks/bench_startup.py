@@ -0,0 +1,49 @@
+# Startup benchmark: compares import time and peak RSS of main.py with the Gradio
+# dashboard mounted versus headless (ingest/API only).
+# Usage: python benchmarks/bench_startup.py [--runs N]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Runs in a fresh interpreter so every measurement is a cold import of main.py.
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"seconds": elapsed, "rss_mb": peak_kb / 1024, "gradio": "gradio" in sys.modules}))
+"""
+
+def measure(headless: bool, runs: int):
+    env = dict(os.environ, SENTINELONEX_HEADLESS="1" if headless else "0")
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", PROBE], cwd=REPO_ROOT, env=env,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"Probe failed (headless={headless}):\n{result.stderr.strip()}")
+            return None
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return {
+        "seconds": statistics.median(s["seconds"] for s in samples),
+        "rss_mb": statistics.median(s["rss_mb"] for s in samples),
+        "gradio": samples[0]["gradio"],
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare main.py startup with and without the Gradio dashboard.")
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts to measure per mode")
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'import (s)':>11} {'peak RSS (MB)':>14} {'gradio loaded':>14}")
+    for label, headless in (("full", False), ("headless", True)):
+        stats = measure(headless, args.runs)
+        if stats:
+            print(f"{label:<10} {stats['seconds']:>11.3f} {stats['rss_mb']:>14.1f} {str(stats['gradio']):>14}")
@@ -0,0 +1,86 @@
+# SentinelOneX Agent Command Channel
+# Per-agent queues of pending response commands (e.g. containment). Commands are
+# delivered in the /ingest response or to an agent waiting on the long-poll endpoint,
+# and redelivered until the agent acknowledges them (at-least-once).
+import asyncio
+import time
+import uuid
+from typing import Dict, Iterable, List
+
+# --- Configuration ---
+LONG_POLL_MAX_SECONDS = 30.0  # Upper bound on how long a poll request is held open
+MAX_PENDING_COMMANDS = 100    # Oldest commands are dropped beyond this per agent
+COMMAND_TTL_SECONDS = 7 * 24 * 3600  # Unacknowledged commands expire after this (e.g. unknown agent ids)
+
+
+class CommandQueues:
+    """
+    Holds unacknowledged commands per agent and wakes agents waiting on a
+    long-poll. Entries exist only while an agent has commands or waiters.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, List[Dict]] = {}
+        self._events: Dict[str, asyncio.Event] = {}
+        self._waiters: Dict[str, int] = {}
+
+    def enqueue(self, agent_id: str, command_type: str, **params) -> Dict:
+        """Queues a command for an agent and wakes any pending long-poll."""
+        command = {
+            "id": uuid.uuid4().hex,
+            "type": command_type,
+            "issued_at": time.time(),
+            "params": params
+        }
+        pending = self._pending.setdefault(agent_id, [])
+        pending.append(command)
+        del pending[:-MAX_PENDING_COMMANDS]
+        event = self._events.get(agent_id)
+        if event is not None:
+            event.set()
+        return command
+
+    def pending(self, agent_id: str) -> List[Dict]:
+        """Returns the commands the agent has not acknowledged yet, without removing them."""
+        pending = self._pending.get(agent_id)
+        if not pending:
+            return []
+        cutoff = time.time() - COMMAND_TTL_SECONDS
+        if pending[0]["issued_at"] < cutoff:
+            pending = [command for command in pending if command["issued_at"] >= cutoff]
+            if pending:
+                self._pending[agent_id] = pending
+            else:
+                del self._pending[agent_id]
+        return list(pending)
+
+    def ack(self, agent_id: str, command_ids: Iterable[str]):
+        """Removes commands the agent has confirmed it received."""
+        acked = set(command_ids)
+        pending = self._pending.get(agent_id)
+        if not acked or not pending:
+            return
+        remaining = [command for command in pending if command["id"] not in acked]
+        if remaining:
+            self._pending[agent_id] = remaining
+        else:
+            del self._pending[agent_id]
+
+    async def wait(self, agent_id: str, timeout: float) -> List[Dict]:
+        """Returns unacknowledged commands, waiting up to `timeout` seconds for one to arrive."""
+        if not self.pending(agent_id):
+            event = self._events.get(agent_id)
+            if event is None:
+                event = self._events[agent_id] = asyncio.Event()
+            self._waiters[agent_id] = self._waiters.get(agent_id, 0) + 1
+            try:
+                await asyncio.wait_for(event.wait(), min(timeout, LONG_POLL_MAX_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                # The last waiter out drops the event, so polls for unknown agent ids leave nothing behind
+                self._waiters[agent_id] -= 1
+                if not self._waiters[agent_id]:
+                    del self._waiters[agent_id]
+                    del self._events[agent_id]
+        return self.pending(agent_id)
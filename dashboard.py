@@ -0,0 +1,229 @@
+# SentinelOneX Dashboard
+# The Gradio UI. Imported lazily by main.py so headless ingest/API nodes never
+# pay for importing gradio or building the interface.
+from typing import Dict, List, Callable
+from datetime import datetime
+
+import gradio as gr
+import httpx
+
+BASE_URL = "http://127.0.0.1:8000" # Base URL for API calls from Gradio
+
+# ==============================================================================
+# GRADIO - UI LOGIC
+# ==============================================================================
+
+async def refresh_agent_list():
+    """Gradio function to call the /agents API and format the output."""
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{BASE_URL}/agents")
+            response.raise_for_status() # Raise an exception for bad status codes
+            data = response.json()
+            
+            agents = data.get("agents", [])
+            if not agents:
+                return [], gr.Dropdown(choices=[], value=None)
+                
+            # Update DataFrame and Dropdown choices
+            agent_ids = [agent['agent_id'] for agent in agents]
+            return agents, gr.Dropdown(choices=agent_ids, value=agent_ids[0] if agent_ids else None)
+    except httpx.RequestError as e:
+        print(f"UI Error fetching agents: {e}")
+        return [], gr.Dropdown(choices=[], value=None)
+
+async def get_agent_details(agent_id: str):
+    """Gradio function to get details for a selected agent."""
+    if not agent_id:
+        return "{}"
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{BASE_URL}/agents/{agent_id}/latest")
+            response.raise_for_status()
+            return response.json()
+    except httpx.RequestError as e:
+        return {"error": f"Could not fetch details for {agent_id}: {e}"}
+
+def generate_fake_telemetry(agent_id: str):
+    """Generates a sample telemetry payload."""
+    return {
+        "timestamp": datetime.now().timestamp(),
+        "agent_id": agent_id or "test-agent-01",
+        "system_info": {
+            "hostname": "dev-machine",
+            "os_platform": "Windows 11",
+            "ip_address": "192.168.1.101"
+        },
+        "processes": [{"pid": 1234, "name": "powershell.exe", "cmdline": "powershell -enc ..."}],
+        "connections": [{"local_port": 49152, "remote_ip": "8.8.8.8", "remote_port": 53}],
+        "network_intelligence": {"dns_queries": ["malicious-domain.com"]}
+    }
+
+async def send_sample_telemetry(agent_id: str):
+    """Gradio function to generate and send a sample telemetry payload."""
+    if not agent_id:
+        return "Error: Agent ID cannot be empty."
+    
+    payload = generate_fake_telemetry(agent_id)
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.post(f"{BASE_URL}/ingest", json=payload)
+            response.raise_for_status()
+            return f"Success! Response: {response.json()['message']}"
+    except httpx.RequestError as e:
+        return f"Error sending telemetry: {e}"
+
+async def refresh_alerts():
+    """Gradio function to call the /alerts API and format the output for the DataFrame."""
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{BASE_URL}/alerts")
+            response.raise_for_status()
+            data = response.json()
+            
+            alerts = data.get("alerts", [])
+            
+            # Store full alerts in a hidden state for later retrieval
+            # For the DataFrame, we only show a subset of fields
+            formatted_alerts_for_df = []
+            for alert in alerts:
+                mitre_id = alert.get("ai_analysis", {}).get("mitre_id", "N/A")
+                remediation_summary = " ".join(alert.get("ai_analysis", {}).get("remediation_plan", ["N/A"]))
+                formatted_alerts_for_df.append([
+                    alert.get("title", "N/A"),
+                    alert.get("severity", "N/A"),
+                    mitre_id,
+                    remediation_summary,
+                    alert.get("evidence", {}).get("agent_id", "N/A") # Hidden agent_id for selection
+                ])
+            return formatted_alerts_for_df, alerts # Return both for DataFrame and full objects
+    except httpx.RequestError as e:
+        print(f"UI Error fetching alerts: {e}")
+        return [], []
+
+async def show_selected_alert_details(selected_data: gr.SelectData, all_alerts: List[Dict]):
+    """Gradio function to display full details of a selected alert and update agent_id state."""
+    if not selected_data.index or not all_alerts:
+        return {}, ""
+    
+    selected_alert_index = selected_data.index[0] # Assuming single row selection
+    if selected_alert_index < 0 or selected_alert_index >= len(all_alerts):
+        return {}, ""
+
+    selected_alert = all_alerts[selected_alert_index]
+    agent_id_for_containment = selected_alert.get("evidence", {}).get("agent_id", "")
+    
+    return selected_alert, agent_id_for_containment
+
+# ==============================================================================
+# GRADIO - UI DEFINITION
+# ==============================================================================
+
+def build_dashboard(contain_fn: Callable) -> gr.Blocks:
+    """Builds the Gradio dashboard; `contain_fn` handles the Contain Host button."""
+    with gr.Blocks(theme=gr.themes.Soft(), title="SentinelOneX") as gradio_interface:
+        gr.Markdown("# SentinelOneX Agent Dashboard")
+
+        with gr.Tabs():
+            with gr.TabItem("Agent Overview"):
+                with gr.Row():
+                    refresh_btn = gr.Button("🔄 Refresh Agent List", variant="primary")
+            
+                with gr.Row():
+                    with gr.Column(scale=1):
+                        gr.Markdown("### Agents")
+                        agent_df = gr.DataFrame(
+                            headers=["agent_id", "last_seen", "os_platform", "hostname"],
+                            datatype=["str", "str", "str", "str"],
+                            row_count=(0, "dynamic"),
+                            interactive=False,
+                        )
+                    
+                    with gr.Column(scale=2):
+                        gr.Markdown("### Latest Agent State")
+                        agent_dropdown = gr.Dropdown(label="Select Agent ID", interactive=True)
+                        agent_details_json = gr.JSON(label="Full Telemetry Data")
+        
+            with gr.TabItem("Testing & Ingestion"):
+                gr.Markdown("## Send Sample Telemetry")
+                gr.Markdown("Use this section to simulate an agent sending data to the `/ingest` endpoint.")
+            
+                test_agent_id = gr.Textbox(label="Agent ID to Simulate", value="test-agent-01")
+                send_telemetry_btn = gr.Button("Send Sample Telemetry", variant="primary")
+                ingest_response_output = gr.Textbox(label="API Response", interactive=False)
+            
+                send_telemetry_btn.click(
+                    fn=send_sample_telemetry,
+                    inputs=[test_agent_id],
+                    outputs=[ingest_response_output]
+                )
+
+            with gr.TabItem("Threat Center"):
+                gr.Markdown("## Live Alerts & Virtual Analyst Reports")
+                with gr.Row():
+                    refresh_alerts_btn = gr.Button("🔄 Refresh Alerts", variant="primary")
+            
+                all_alerts_state = gr.State([]) # Hidden state to store full alert objects
+                selected_agent_id_state = gr.State("") # Hidden state for selected agent_id for containment
+
+                with gr.Row():
+                    with gr.Column(scale=2):
+                        gr.Markdown("### Detected Alerts")
+                        alerts_table = gr.DataFrame(
+                            headers=["Title", "Severity", "MITRE ATT&CK", "Remediation Summary", "Agent ID (Hidden)"],
+                            datatype=["str", "str", "str", "str", "str"],
+                            row_count=(5, "dynamic"),
+                            interactive=False,
+                            visible=True # Make sure it's visible
+                        )
+                        alerts_table.change(
+                            fn=show_selected_alert_details,
+                            inputs=[alerts_table, all_alerts_state],
+                            outputs=[gr.JSON(label="Selected Alert Details"), selected_agent_id_state]
+                        )
+
+                    with gr.Column(scale=1):
+                        gr.Markdown("### Alert Details & Response")
+                        alert_details_json = gr.JSON(label="Full Alert Data")
+                        contain_host_btn = gr.Button("🚨 Contain Host", variant="stop")
+                        containment_status_output = gr.Textbox(label="Containment Status", interactive=False)
+                    
+                        contain_host_btn.click(
+                            fn=contain_fn,
+                            inputs=[selected_agent_id_state],
+                            outputs=[containment_status_output]
+                        )
+
+        # --- UI Event Wiring ---
+        refresh_btn.click(
+            fn=refresh_agent_list,
+            inputs=[],
+            outputs=[agent_df, agent_dropdown]
+        )
+
+        agent_dropdown.change(
+            fn=get_agent_details,
+            inputs=[agent_dropdown],
+            outputs=[agent_details_json]
+        )
+    
+        # Load initial agent list when the UI starts
+        gradio_interface.load(
+            fn=refresh_agent_list,
+            inputs=[],
+            outputs=[agent_df, agent_dropdown]
+        )
+
+        # Threat Center events
+        refresh_alerts_btn.click(
+            fn=refresh_alerts,
+            inputs=[],
+            outputs=[alerts_table, all_alerts_state]
+        )
+        gradio_interface.load(
+            fn=refresh_alerts,
+            inputs=[],
+            outputs=[alerts_table, all_alerts_state]
+        )
+
+    return gradio_interface
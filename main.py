@@ -1,6 +1,8 @@
 import json
 import os
+import sys
 import asyncio
+import time
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Any
@@ -8,13 +10,17 @@ import requests
 
 # --- Core Dependencies ---
 import uvicorn
-import gradio as gr
 import aiofiles
-import httpx
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Query, Request
+from pydantic import BaseModel, Field, ValidationError
 from fastapi.middleware.cors import CORSMiddleware
 
+from admission import AdmissionController, MAX_INGEST_BYTES, INGEST_READ_TIMEOUT_SECONDS
+from baseline import BaselineStore
+from commands import CommandQueues
+from notifications import NotificationDispatcher
+from telemetry import ProcessTable, ConnectionTable
+
 # --- Application Setup ---
 app = FastAPI(
     title="SentinelOneX Backend",
@@ -39,18 +45,31 @@ app.add_middleware(
 # --- Configuration ---
 DATA_DIR = Path("data")
 DATA_DIR.mkdir(exist_ok=True)
-BASE_URL = "http://127.0.0.1:8000" # Base URL for API calls from Gradio
+# Headless mode runs a lean ingest/API node: gradio is never imported and no UI is mounted.
+# Enable with SENTINELONEX_HEADLESS=1 or `python main.py --headless`.
+HEADLESS = os.getenv("SENTINELONEX_HEADLESS", "").lower() in ("1", "true", "yes") or \
+    (__name__ == "__main__" and "--headless" in sys.argv[1:])
 
 # --- Pydantic Models (Data Contracts) ---
 class TelemetryData(BaseModel):
     timestamp: float
     agent_id: str
     system_info: Dict[str, Any]
-    processes: List[Dict[str, Any]]
-    connections: List[Dict[str, Any]]
+    processes: ProcessTable
+    connections: ConnectionTable
     network_intelligence: Dict[str, Any]
+    # Command ids the agent has received, from agents that send them in the body rather than as ?ack=;
+    # not part of the stored snapshot
+    acked_command_ids: List[str] = Field(default_factory=list, exclude=True)
 
 ALL_ALERTS: List[Dict] = [] # In-memory store for alerts
+AI_ENRICHED_SEVERITIES = {"high", "critical"} # Lower-severity alerts skip the Ollama call
+_enrichment_tasks = set() # Keeps background enrichment tasks referenced until they finish
+AGENT_SUMMARIES: Dict[str, Dict[str, str]] = {} # /agents listing fields per agent, from its latest snapshot
+BASELINES = BaselineStore(DATA_DIR) # Per-agent behavioral baselines, persisted next to each agent's telemetry
+COMMANDS = CommandQueues() # Pending commands per agent, delivered on ingest or long-poll
+NOTIFIER = NotificationDispatcher() # Batched, non-blocking email/SMS fan-out
+ADMISSION = AdmissionController() # Rate limits and load shedding for /ingest
 
 # ==============================================================================
 # FASTAPI - API ENDPOINTS
@@ -76,27 +95,109 @@ def run_detection_engine(telemetry: TelemetryData) -> List[Dict]:
             })
     
     # --- RULE 2: PowerShell Download Cradle ---
-    for process in telemetry.processes:
-        if process.get("name", "").lower() == "powershell.exe" and \
-           "downloadstring" in process.get("cmdline", "").lower() and \
-           "iex" in process.get("cmdline", "").lower():
+    processes = telemetry.processes
+    names = processes.name_lower if "powershell.exe" in processes.name_lower else ()
+    for i, name in enumerate(names):
+        if name != "powershell.exe":
+            continue
+        cmdline = (processes.cmdline_text[i] or "").lower()
+        if "downloadstring" in cmdline and "iex" in cmdline:
             alerts.append({
                 "title": "PowerShell Download Cradle Detected",
                 "description": "Malicious PowerShell download cradle detected in process command line.",
                 "severity": "critical",
                 "evidence": {
                     "agent_id": telemetry.agent_id,
-                    "pid": process.get("pid"),
-                    "cmdline": process.get("cmdline")
+                    "pid": processes.pid[i],
+                    "cmdline": processes.cmdline[i]
                 }
             })
+
+    # --- RULE 3: Deviation from Agent's Behavioral Baseline ---
+    alerts.extend(BASELINES.evaluate(telemetry.agent_id, telemetry.processes, telemetry.connections))
             
     return alerts
 
-@app.post("/ingest", summary="Ingest Telemetry Data")
-async def receive_telemetry(data: TelemetryData):
-    """Receive and store telemetry data from agents"""
+def rejection_error(rejection) -> HTTPException:
+    status_code, retry_after, reason = rejection
+    return HTTPException(status_code=status_code, detail=reason, headers={"Retry-After": str(retry_after)})
+
+async def read_ingest_body(request: Request) -> bytes:
+    """
+    Reads the request body, rejecting it with 413 as soon as it exceeds
+    MAX_INGEST_BYTES, or 408 if it takes longer than INGEST_READ_TIMEOUT_SECONDS.
+    """
+    too_large = HTTPException(status_code=413, detail=f"Payload exceeds {MAX_INGEST_BYTES} bytes")
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > MAX_INGEST_BYTES:
+        raise too_large
+    body = bytearray()
+
+    async def read():
+        async for chunk in request.stream():
+            body.extend(chunk)
+            if len(body) > MAX_INGEST_BYTES:
+                raise too_large
+
+    try:
+        await asyncio.wait_for(read(), INGEST_READ_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=408, detail="Request body not received in time")
+    return bytes(body)
+
+@app.post(
+    "/ingest",
+    summary="Ingest Telemetry Data",
+    openapi_extra={"requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": TelemetryData.model_json_schema()}}
+    }}
+)
+async def receive_telemetry(request: Request):
+    """
+    Admit, size-check and parse agent telemetry before storing it. Command ids
+    the agent has received are acknowledged with `?ack=`. Rejected requests get
+    429 (rate limited) or 503 (overloaded) with a Retry-After header.
+    """
+    claimed_agent_id = request.headers.get("X-Agent-ID")
+    client_ip = request.client.host if request.client else "unknown"
+    # Agent ids not yet verified against a payload are limited by client IP until the body is parsed
+    charged_agent_id = claimed_agent_id if ADMISSION.is_tracked(claimed_agent_id) else None
+    rejection = ADMISSION.admit(charged_agent_id, client_ip)
+    if rejection:
+        raise rejection_error(rejection)
+
+    # Uploads still in progress don't count as in flight; the read deadline bounds them instead
+    body = await read_ingest_body(request)
+    ADMISSION.started()
+    processing_seconds = None
     try:
+        try:
+            data = TelemetryData.model_validate_json(body)
+        except ValidationError as e:
+            raise HTTPException(status_code=422,
+                                detail=e.errors(include_url=False, include_context=False, include_input=False))
+
+        if claimed_agent_id is not None and claimed_agent_id != data.agent_id:
+            raise HTTPException(status_code=400, detail="X-Agent-ID header does not match payload agent_id")
+        if charged_agent_id is None:
+            rejection = ADMISSION.charge_agent(data.agent_id)
+            if rejection:
+                raise rejection_error(rejection)
+
+        # Only processing time feeds load shedding, so slow uploads can't trigger it
+        started = time.perf_counter()
+        response = await store_telemetry(data, body, request.query_params.getlist("ack"))
+        processing_seconds = time.perf_counter() - started
+        return response
+    finally:
+        ADMISSION.finished(processing_seconds)
+
+async def store_telemetry(data: TelemetryData, body: bytes, acked_command_ids: List[str]):
+    """Store telemetry data from an agent (its JSON `body`, as received) and run detections on it"""
+    try:
+        COMMANDS.ack(data.agent_id, acked_command_ids + data.acked_command_ids)
+
         agent_dir = DATA_DIR / data.agent_id
         agent_dir.mkdir(exist_ok=True)
 
@@ -104,38 +205,51 @@ async def receive_telemetry(data: TelemetryData):
         ts_obj = datetime.fromtimestamp(data.timestamp)
         filename = f"telemetry_{ts_obj.strftime('%Y%m%d_%H%M%S_%f')}.json"
         
-        # Asynchronously save telemetry data and the latest state
-        data_json = data.model_dump()
+        # Asynchronously save telemetry data and the latest state. The validated body is stored as sent,
+        # so the snapshot isn't serialized again; only bodies carrying acks are re-encoded without them.
+        data_json = data.model_dump_json(indent=2).encode("utf-8") if data.acked_command_ids else body
         
-        async with aiofiles.open(agent_dir / filename, "w") as f:
-            await f.write(json.dumps(data_json, indent=2))
+        async with aiofiles.open(agent_dir / filename, "wb") as f:
+            await f.write(data_json)
         
-        async with aiofiles.open(agent_dir / "latest_state.json", "w") as f:
-            await f.write(json.dumps(data_json, indent=2))
+        async with aiofiles.open(agent_dir / "latest_state.json", "wb") as f:
+            await f.write(data_json)
+        AGENT_SUMMARIES[data.agent_id] = agent_summary(data.agent_id, data.timestamp, data.system_info)
 
         # Run detection engine
         alerts = run_detection_engine(data)
         if alerts:
             print("[*] Detected Alerts:")
             for alert in alerts:
-                # Get AI analysis for the alert
-                ai_analysis = get_ai_analysis(alert["title"])
-                alert["ai_analysis"] = ai_analysis
-                ALL_ALERTS.append(alert) # Save enriched alert to in-memory store
+                ALL_ALERTS.append(alert) # Save alert to in-memory store; AI analysis is filled in later
                 print(json.dumps(alert, indent=2))
+                if alert["severity"] in AI_ENRICHED_SEVERITIES:
+                    task = asyncio.create_task(enrich_alert(alert))
+                    _enrichment_tasks.add(task)
+                    task.add_done_callback(_enrichment_tasks.discard)
 
         return {
             "status": "success",
             "message": f"Telemetry received from {data.agent_id}",
-            "timestamp": ts_obj.isoformat()
+            "timestamp": ts_obj.isoformat(),
+            "commands": COMMANDS.pending(data.agent_id)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
 
+def agent_summary(agent_id: str, timestamp: float, system_info: Dict[str, Any]) -> Dict[str, str]:
+    return {
+        "agent_id": agent_id,
+        "last_seen": datetime.fromtimestamp(timestamp).isoformat(),
+        "os_platform": system_info.get("os_platform", "N/A"),
+        "hostname": system_info.get("hostname", "N/A"),
+    }
+
 @app.get("/agents", summary="List All Agents")
 async def list_agents():
     """
-    List all agents that have sent telemetry by reading their 'latest_state.json'.
+    List all agents that have sent telemetry, from their cached summary or
+    their 'latest_state.json'.
     """
     agents = []
     if not DATA_DIR.exists():
@@ -143,17 +257,19 @@ async def list_agents():
         
     for agent_dir in DATA_DIR.iterdir():
         if agent_dir.is_dir():
+            summary = AGENT_SUMMARIES.get(agent_dir.name)
+            if summary is not None:
+                agents.append(summary)
+                continue
             latest_state_path = agent_dir / "latest_state.json"
             if latest_state_path.exists():
                 try:
-                    async with aiofiles.open(latest_state_path, "r") as f:
+                    async with aiofiles.open(latest_state_path, "r", encoding="utf-8") as f:
                         state = json.loads(await f.read())
-                        agents.append({
-                            "agent_id": state.get("agent_id", "N/A"),
-                            "last_seen": datetime.fromtimestamp(state.get("timestamp", 0)).isoformat(),
-                            "os_platform": state.get("system_info", {}).get("os_platform", "N/A"),
-                            "hostname": state.get("system_info", {}).get("hostname", "N/A"),
-                        })
+                        summary = agent_summary(state.get("agent_id", "N/A"), state.get("timestamp", 0),
+                                                state.get("system_info", {}))
+                        AGENT_SUMMARIES[agent_dir.name] = summary
+                        agents.append(summary)
                 except (json.JSONDecodeError, KeyError) as e:
                     # Log this error or handle it as needed
                     print(f"Warning: Could not process state for {agent_dir.name}: {e}")
@@ -170,7 +286,7 @@ async def get_agent_state(agent_id: str):
         raise HTTPException(status_code=404, detail="Agent not found")
     
     try:
-        async with aiofiles.open(latest_state_path) as f:
+        async with aiofiles.open(latest_state_path, encoding="utf-8") as f:
             content = await f.read()
             return json.loads(content)
     except Exception as e:
@@ -183,77 +299,26 @@ async def list_all_alerts():
 
 @app.post("/agents/{agent_id}/contain", summary="Contain Agent Host")
 async def contain_agent(agent_id: str):
-    """Simulates issuing a containment command for a specific agent."""
+    """Queues a containment command for a specific agent and notifies responders."""
     print(f"!!! CONTAINMENT COMMAND ISSUED FOR AGENT: {agent_id} !!!")
+    command = COMMANDS.enqueue(agent_id, "contain")
     subject = f"CRITICAL: Containment Action for Agent {agent_id}"
     body = f"A containment action was initiated for agent {agent_id} due to detected threats."
-    send_email_alert(subject, body)
-    send_sms_alert(f"CRITICAL: Agent {agent_id} contained.")
-    return {"status": "containment command issued", "agent_id": agent_id}
+    NOTIFIER.notify(subject, body, f"CRITICAL: Agent {agent_id} contained.")
+    return {"status": "containment command issued", "agent_id": agent_id, "command_id": command["id"]}
 
-# ==============================================================================
-# GRADIO - UI LOGIC
-# ==============================================================================
-
-async def refresh_agent_list():
-    """Gradio function to call the /agents API and format the output."""
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{BASE_URL}/agents")
-            response.raise_for_status() # Raise an exception for bad status codes
-            data = response.json()
-            
-            agents = data.get("agents", [])
-            if not agents:
-                return [], gr.Dropdown(choices=[], value=None)
-                
-            # Update DataFrame and Dropdown choices
-            agent_ids = [agent['agent_id'] for agent in agents]
-            return agents, gr.Dropdown(choices=agent_ids, value=agent_ids[0] if agent_ids else None)
-    except httpx.RequestError as e:
-        print(f"UI Error fetching agents: {e}")
-        return [], gr.Dropdown(choices=[], value=None)
-
-async def get_agent_details(agent_id: str):
-    """Gradio function to get details for a selected agent."""
-    if not agent_id:
-        return "{}"
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{BASE_URL}/agents/{agent_id}/latest")
-            response.raise_for_status()
-            return response.json()
-    except httpx.RequestError as e:
-        return {"error": f"Could not fetch details for {agent_id}: {e}"}
-
-def generate_fake_telemetry(agent_id: str):
-    """Generates a sample telemetry payload."""
-    return {
-        "timestamp": datetime.now().timestamp(),
-        "agent_id": agent_id or "test-agent-01",
-        "system_info": {
-            "hostname": "dev-machine",
-            "os_platform": "Windows 11",
-            "ip_address": "192.168.1.101"
-        },
-        "processes": [{"pid": 1234, "name": "powershell.exe", "cmdline": "powershell -enc ..."}],
-        "connections": [{"local_port": 49152, "remote_ip": "8.8.8.8", "remote_port": 53}],
-        "network_intelligence": {"dns_queries": ["malicious-domain.com"]}
-    }
+@app.get("/agents/{agent_id}/commands", summary="Long-Poll for Agent Commands")
+async def poll_agent_commands(agent_id: str, wait: float = 25.0, ack: List[str] = Query(default=[])):
+    """
+    Acknowledge the command ids in `ack`, then return the agent's unacknowledged
+    commands, holding the request open for up to `wait` seconds until one is issued.
+    """
+    COMMANDS.ack(agent_id, ack)
+    return {"commands": await COMMANDS.wait(agent_id, max(wait, 0.0))}
 
-async def send_sample_telemetry(agent_id: str):
-    """Gradio function to generate and send a sample telemetry payload."""
-    if not agent_id:
-        return "Error: Agent ID cannot be empty."
-    
-    payload = generate_fake_telemetry(agent_id)
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"{BASE_URL}/ingest", json=payload)
-            response.raise_for_status()
-            return f"Success! Response: {response.json()['message']}"
-    except httpx.RequestError as e:
-        return f"Error sending telemetry: {e}"
+async def enrich_alert(alert: Dict):
+    """Attaches AI analysis to a stored alert without holding up the ingest request."""
+    alert["ai_analysis"] = await asyncio.to_thread(get_ai_analysis, alert["title"])
 
 def get_ai_analysis(alert_title: str) -> Dict:
     """Calls the Ollama API to get an AI-driven analysis of an alert."""
@@ -294,173 +359,17 @@ def get_ai_analysis(alert_title: str) -> Dict:
         print(f"Error during Ollama API request: {e}")
         return {"summary": f"AI analysis failed: {e}", "mitre_id": "N/A", "remediation_plan": ["Check Ollama API status."]}
 
-async def refresh_alerts():
-    """Gradio function to call the /alerts API and format the output for the DataFrame."""
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{BASE_URL}/alerts")
-            response.raise_for_status()
-            data = response.json()
-            
-            alerts = data.get("alerts", [])
-            
-            # Store full alerts in a hidden state for later retrieval
-            # For the DataFrame, we only show a subset of fields
-            formatted_alerts_for_df = []
-            for alert in alerts:
-                mitre_id = alert.get("ai_analysis", {}).get("mitre_id", "N/A")
-                remediation_summary = " ".join(alert.get("ai_analysis", {}).get("remediation_plan", ["N/A"]))
-                formatted_alerts_for_df.append([
-                    alert.get("title", "N/A"),
-                    alert.get("severity", "N/A"),
-                    mitre_id,
-                    remediation_summary,
-                    alert.get("evidence", {}).get("agent_id", "N/A") # Hidden agent_id for selection
-                ])
-            return formatted_alerts_for_df, alerts # Return both for DataFrame and full objects
-    except httpx.RequestError as e:
-        print(f"UI Error fetching alerts: {e}")
-        return [], []
-
-async def show_selected_alert_details(selected_data: gr.SelectData, all_alerts: List[Dict]):
-    """Gradio function to display full details of a selected alert and update agent_id state."""
-    if not selected_data.index or not all_alerts:
-        return {}, ""
-    
-    selected_alert_index = selected_data.index[0] # Assuming single row selection
-    if selected_alert_index < 0 or selected_alert_index >= len(all_alerts):
-        return {}, ""
-
-    selected_alert = all_alerts[selected_alert_index]
-    agent_id_for_containment = selected_alert.get("evidence", {}).get("agent_id", "")
-    
-    return selected_alert, agent_id_for_containment
-
-# ==============================================================================
-# GRADIO - UI DEFINITION
-# ==============================================================================
-
-with gr.Blocks(theme=gr.themes.Soft(), title="SentinelOneX") as gradio_interface:
-    gr.Markdown("# SentinelOneX Agent Dashboard")
-
-    with gr.Tabs():
-        with gr.TabItem("Agent Overview"):
-            with gr.Row():
-                refresh_btn = gr.Button("🔄 Refresh Agent List", variant="primary")
-            
-            with gr.Row():
-                with gr.Column(scale=1):
-                    gr.Markdown("### Agents")
-                    agent_df = gr.DataFrame(
-                        headers=["agent_id", "last_seen", "os_platform", "hostname"],
-                        datatype=["str", "str", "str", "str"],
-                        row_count=(0, "dynamic"),
-                        interactive=False,
-                    )
-                    
-                with gr.Column(scale=2):
-                    gr.Markdown("### Latest Agent State")
-                    agent_dropdown = gr.Dropdown(label="Select Agent ID", interactive=True)
-                    agent_details_json = gr.JSON(label="Full Telemetry Data")
-        
-        with gr.TabItem("Testing & Ingestion"):
-            gr.Markdown("## Send Sample Telemetry")
-            gr.Markdown("Use this section to simulate an agent sending data to the `/ingest` endpoint.")
-            
-            test_agent_id = gr.Textbox(label="Agent ID to Simulate", value="test-agent-01")
-            send_telemetry_btn = gr.Button("Send Sample Telemetry", variant="primary")
-            ingest_response_output = gr.Textbox(label="API Response", interactive=False)
-            
-            send_telemetry_btn.click(
-                fn=send_sample_telemetry,
-                inputs=[test_agent_id],
-                outputs=[ingest_response_output]
-            )
-
-        with gr.TabItem("Threat Center"):
-            gr.Markdown("## Live Alerts & Virtual Analyst Reports")
-            with gr.Row():
-                refresh_alerts_btn = gr.Button("🔄 Refresh Alerts", variant="primary")
-            
-            all_alerts_state = gr.State([]) # Hidden state to store full alert objects
-            selected_agent_id_state = gr.State("") # Hidden state for selected agent_id for containment
-
-            with gr.Row():
-                with gr.Column(scale=2):
-                    gr.Markdown("### Detected Alerts")
-                    alerts_table = gr.DataFrame(
-                        headers=["Title", "Severity", "MITRE ATT&CK", "Remediation Summary", "Agent ID (Hidden)"],
-                        datatype=["str", "str", "str", "str", "str"],
-                        row_count=(5, "dynamic"),
-                        interactive=False,
-                        visible=True # Make sure it's visible
-                    )
-                    alerts_table.change(
-                        fn=show_selected_alert_details,
-                        inputs=[alerts_table, all_alerts_state],
-                        outputs=[gr.JSON(label="Selected Alert Details"), selected_agent_id_state]
-                    )
-
-                with gr.Column(scale=1):
-                    gr.Markdown("### Alert Details & Response")
-                    alert_details_json = gr.JSON(label="Full Alert Data")
-                    contain_host_btn = gr.Button("🚨 Contain Host", variant="stop")
-                    containment_status_output = gr.Textbox(label="Containment Status", interactive=False)
-                    
-                    contain_host_btn.click(
-                        fn=contain_agent,
-                        inputs=[selected_agent_id_state],
-                        outputs=[containment_status_output]
-                    )
-
-    # --- UI Event Wiring ---
-    refresh_btn.click(
-        fn=refresh_agent_list,
-        inputs=[],
-        outputs=[agent_df, agent_dropdown]
-    )
-
-    agent_dropdown.change(
-        fn=get_agent_details,
-        inputs=[agent_dropdown],
-        outputs=[agent_details_json]
-    )
-    
-    # Load initial agent list when the UI starts
-    gradio_interface.load(
-        fn=refresh_agent_list,
-        inputs=[],
-        outputs=[agent_df, agent_dropdown]
-    )
-
-    # Threat Center events
-    refresh_alerts_btn.click(
-        fn=refresh_alerts,
-        inputs=[],
-        outputs=[alerts_table, all_alerts_state]
-    )
-    gradio_interface.load(
-        fn=refresh_alerts,
-        inputs=[],
-        outputs=[alerts_table, all_alerts_state]
-    )
-
 
 # ==============================================================================
 # ENTRY POINT
 # ==============================================================================
 
-# Mount the Gradio app onto the FastAPI app
-app = gr.mount_gradio_app(app, gradio_interface, path="/")
+# Mount the Gradio app onto the FastAPI app (skipped entirely in headless mode)
+if not HEADLESS:
+    import gradio as gr
+    from dashboard import build_dashboard
+    app = gr.mount_gradio_app(app, build_dashboard(contain_agent), path="/")
 
 if __name__ == "__main__":
     # --- Run with Uvicorn ---
     uvicorn.run(app, host="127.0.0.1", port=8000, log_level="info")
-
-def send_email_alert(subject: str, body: str):
-    """Simulates sending an email alert."""
-    print(f"[EMAIL ALERT] Subject: {subject}, Body: {body}")
-
-def send_sms_alert(message: str):
-    """Simulates sending an SMS alert."""
-    print(f"[SMS ALERT] Message: {message}")
\ No newline at end of file
@@ -0,0 +1,64 @@
+# SentinelOneX Notifications
+# Email/SMS alerting. Notifications are queued and sent in batches from a
+# background task so that request handlers never block on delivery.
+import asyncio
+from typing import List, Optional, Tuple
+
+# --- Configuration ---
+NOTIFY_BATCH_WINDOW_SECONDS = 1.0  # How long to collect notifications into one batch
+NOTIFY_MAX_BATCH = 50              # Maximum notifications per batch
+
+
+def send_email_alert(subject: str, body: str):
+    """Simulates sending an email alert."""
+    print(f"[EMAIL ALERT] Subject: {subject}, Body: {body}")
+
+
+def send_sms_alert(message: str):
+    """Simulates sending an SMS alert."""
+    print(f"[SMS ALERT] Message: {message}")
+
+
+class NotificationDispatcher:
+    """Queues notifications and fans them out in batches from a background task."""
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+
+    def notify(self, subject: str, body: str, sms_message: str):
+        """Queues a notification without waiting for it to be delivered."""
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        self._queue.put_nowait((subject, body, sms_message))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + NOTIFY_BATCH_WINDOW_SECONDS
+            while len(batch) < NOTIFY_MAX_BATCH:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await asyncio.to_thread(self._send_batch, batch)
+            except Exception as e:
+                print(f"Error sending notifications: {e}")
+
+    @staticmethod
+    def _send_batch(batch: List[Tuple[str, str, str]]):
+        if len(batch) == 1:
+            subject, body, sms_message = batch[0]
+            send_email_alert(subject, body)
+            send_sms_alert(sms_message)
+            return
+        send_email_alert(
+            f"{len(batch)} notifications: {batch[0][0]} (+{len(batch) - 1} more)",
+            "\n\n".join(f"{subject}\n{body}" for subject, body, _ in batch)
+        )
+        send_sms_alert(" | ".join(sms_message for _, _, sms_message in batch))
@@ -7,11 +7,22 @@ import json
 import time
 import socket
 import platform
+import random
+import threading
 
 # --- Configuration ---
-PLATFORM_URL = "http://127.0.0.1:8000/ingest"  # Backend server URL
+PLATFORM_BASE_URL = "http://127.0.0.1:8000"  # Backend server URL
+PLATFORM_URL = f"{PLATFORM_BASE_URL}/ingest"
 COLLECTION_INTERVAL_SECONDS = 15  # Interval for sending telemetry
+COMMAND_POLL_WAIT_SECONDS = 25  # How long the server may hold a command long-poll open
+MAX_BACKOFF_SECONDS = 300  # Upper bound on the delay after repeated failures
+BACKOFF_SECONDS = 0  # Delay requested by the platform (Retry-After) or after failures
+_consecutive_failures = 0
 AGENT_ID = None # Will be set to the machine's hostname
+CONTAINED = False # Set once the platform has issued a containment command
+_handled_command_ids = set()
+_unacked_command_ids = set() # Received commands not yet acknowledged to the platform
+_command_lock = threading.Lock()
 
 def get_system_info():
     """Gathers basic static information about the host system."""
@@ -63,7 +74,7 @@ def get_system_info():
 def get_process_telemetry():
     """Collects information about all running processes."""
     processes = []
-    for proc in psutil.process_iter(['pid', 'name', 'username', 'cmdline']):
+    for proc in psutil.process_iter(['pid', 'ppid', 'name', 'username', 'cmdline']):
         try:
             info = proc.info
             cmdline = info.get('cmdline', [])
@@ -71,6 +82,7 @@ def get_process_telemetry():
             cmdline_str = ' '.join(cmdline) if cmdline else ''
             processes.append({
                 'pid': info.get('pid'),
+                'ppid': info.get('ppid'),
                 'name': info.get('name'),
                 'username': info.get('username'),
                 'cmdline': cmdline_str
@@ -163,18 +175,104 @@ def package_all_telemetry(system_info):
     }
     return payload
 
+def _record_send_result(success, retry_after=None):
+    """
+    Updates BACKOFF_SECONDS with exponential backoff over consecutive failures,
+    never shorter than the platform's Retry-After hint, so repeated throttling escalates.
+    """
+    global BACKOFF_SECONDS, _consecutive_failures
+    if success:
+        _consecutive_failures = 0
+        BACKOFF_SECONDS = 0
+        return
+    _consecutive_failures += 1
+    exponential = COLLECTION_INTERVAL_SECONDS * 2 ** (_consecutive_failures - 1)
+    BACKOFF_SECONDS = min(max(exponential, retry_after or 0), MAX_BACKOFF_SECONDS)
+
+def _parse_retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+def next_send_delay():
+    """Seconds to wait before the next collection, with jitter so the fleet doesn't retry in lockstep."""
+    delay = max(COLLECTION_INTERVAL_SECONDS, BACKOFF_SECONDS)
+    return delay + random.uniform(0, delay * 0.2)
+
 def send_telemetry_to_platform(payload):
-    """Sends the final telemetry payload to the platform backend."""
+    """Sends the final telemetry payload to the platform backend and returns any piggybacked commands."""
+    acks = _take_acks()
     try:
-        response = requests.post(PLATFORM_URL, json=payload, timeout=5)
+        response = requests.post(PLATFORM_URL, json=payload, params={"ack": acks},
+                                 headers={"X-Agent-ID": str(payload.get("agent_id"))}, timeout=5)
         if response.status_code == 200:
             print("Telemetry sent successfully.")
+            _confirm_acks(acks)
+            _record_send_result(True)
+            return response.json().get("commands", [])
+        elif response.status_code in (429, 503):
+            _record_send_result(False, _parse_retry_after(response))
+            print(f"Platform is throttling telemetry ({response.status_code}). Backing off for {BACKOFF_SECONDS:.0f}s.")
         else:
+            _record_send_result(False)
             print(f"Failed to send telemetry. Status code: {response.status_code}")
     except requests.ConnectionError:
+        _record_send_result(False)
         print("Connection error: Unable to reach the platform backend.")
     except Exception as e:
+        _record_send_result(False)
         print(f"Error sending telemetry: {e}")
+    return []
+
+def contain_host():
+    """Simulates isolating the host from the network."""
+    global CONTAINED
+    CONTAINED = True
+    print("!!! HOST CONTAINMENT ENGAGED BY PLATFORM !!!")
+
+def _take_acks():
+    with _command_lock:
+        return sorted(_unacked_command_ids)
+
+def _confirm_acks(acks):
+    """Forgets acks the platform has received; until then they are resent with every request."""
+    with _command_lock:
+        _unacked_command_ids.difference_update(acks)
+
+def handle_commands(commands):
+    """Executes commands received from the platform, skipping ones already handled."""
+    for command in commands:
+        with _command_lock:
+            # Commands are redelivered until acknowledged, so ack duplicates too
+            _unacked_command_ids.add(command.get("id"))
+            if command.get("id") in _handled_command_ids:
+                continue
+            _handled_command_ids.add(command.get("id"))
+        if command.get("type") == "contain":
+            contain_host()
+        else:
+            print(f"Ignoring unknown command from platform: {command.get('type')}")
+
+def poll_for_commands():
+    """Long-polls the platform for commands so they are acted on between telemetry intervals."""
+    url = f"{PLATFORM_BASE_URL}/agents/{AGENT_ID}/commands"
+    while True:
+        acks = _take_acks()
+        try:
+            response = requests.get(url, params={"wait": COMMAND_POLL_WAIT_SECONDS, "ack": acks},
+                                    timeout=COMMAND_POLL_WAIT_SECONDS + 10)
+            if response.status_code == 200:
+                _confirm_acks(acks)
+                handle_commands(response.json().get("commands", []))
+                continue
+            print(f"Command poll failed. Status code: {response.status_code}")
+        except requests.RequestException as e:
+            print(f"Command poll error: {e}")
+        except Exception as e:
+            print(f"Unexpected error while polling for commands: {e}")
+        # Back off before retrying after a failure
+        time.sleep(COLLECTION_INTERVAL_SECONDS)
 
 if __name__ == "__main__":
     # Get the static system info once at the start.
@@ -182,16 +280,19 @@ if __name__ == "__main__":
     AGENT_ID = system_info['hostname']
     print(f"SentinelOneX Agent started on host: {AGENT_ID}")
 
+    # Listen for platform commands (e.g. containment) in the background.
+    threading.Thread(target=poll_for_commands, daemon=True).start()
+
     # Start the main infinite loop.
     while True:
         # Use a main try-except block to ensure the agent is resilient and never crashes.
         try:
             print(f"[{time.ctime()}] Collecting telemetry...")
             payload = package_all_telemetry(system_info)
-            send_telemetry_to_platform(payload)
+            handle_commands(send_telemetry_to_platform(payload))
             print(f"[{time.ctime()}] Telemetry sent successfully. Waiting for next interval...")
         except Exception as e:
             print(f"An unexpected error occurred in the main loop: {e}")
 
-        # Wait for the configured interval before the next collection.
-        time.sleep(COLLECTION_INTERVAL_SECONDS)
+        # Wait for the configured interval (or longer, if the platform asked us to back off).
+        time.sleep(next_send_delay())
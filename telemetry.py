@@ -0,0 +1,150 @@
+# SentinelOneX Telemetry Tables
+# Compact, column-oriented representations of the per-snapshot process and
+# connection lists. Each field is stored as one tuple across all rows, with
+# normalized fields (e.g. lowercase name) computed once at validation, instead
+# of one dict per row.
+import sys
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pydantic_core import core_schema
+
+
+class ColumnTable:
+    """
+    Base class for struct-of-arrays tables. Subclasses list their columns in
+    FIELDS (one __slots__ entry each). Rows that deviate from FIELDS are
+    recorded sparsely so the original records round-trip unchanged: keys
+    outside FIELDS are kept in `extras`, and FIELDS the row did not have (their
+    column holds None) are listed in `absent`.
+    """
+    FIELDS: Tuple[str, ...] = ()
+    __slots__ = ("extras", "absent")
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._column_getters = tuple(itemgetter(field) for field in cls.FIELDS)
+
+    def __init__(self, columns: Sequence[Tuple[Any, ...]], extras: Dict[int, Dict[str, Any]],
+                 absent: Dict[int, Tuple[str, ...]]):
+        for field, column in zip(self.FIELDS, columns):
+            setattr(self, field, column)
+        self.extras = extras
+        self.absent = absent
+        self._derive()
+
+    def _derive(self):
+        """Computes normalized columns once, after the raw columns are filled in."""
+
+    @classmethod
+    def from_records(cls, records: Any) -> "ColumnTable":
+        if isinstance(records, cls):
+            return records
+        if not isinstance(records, list):
+            raise ValueError("must be a list of objects")
+        fields = cls.FIELDS
+        if not records:
+            return cls([()] * len(fields), {}, {})
+        # Fast path: every row has exactly FIELDS (a row with that many keys that has them all has no
+        # others), so each column is pulled out by one itemgetter map without a Python-level loop.
+        try:
+            if set(map(len, records)) == {len(fields)}:
+                return cls([tuple(map(getter, records)) for getter in cls._column_getters], {}, {})
+        except (KeyError, TypeError):
+            pass
+        return cls._from_irregular_records(records)
+
+    @classmethod
+    def _from_irregular_records(cls, records: List[Any]) -> "ColumnTable":
+        fields = cls.FIELDS
+        known = frozenset(fields)
+        extras, absent = {}, {}
+        for index, record in enumerate(records):
+            if type(record) is not dict:
+                raise ValueError(f"item {index} must be an object")
+            if record.keys() != known:
+                keys = record.keys()
+                extra = {key: value for key, value in record.items() if key not in known}
+                if extra:
+                    extras[index] = extra
+                missing = tuple(field for field in fields if field not in keys)
+                if missing:
+                    absent[index] = missing
+        columns = [tuple(record.get(field) for record in records) for field in fields]
+        return cls(columns, extras, absent)
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        fields = self.FIELDS
+        records = [dict(zip(fields, row)) for row in zip(*(getattr(self, field) for field in fields))]
+        for index, missing in self.absent.items():
+            record = records[index]
+            for field in missing:
+                del record[field]
+        for index, extra in self.extras.items():
+            records[index].update(extra)
+        return records
+
+    def __len__(self) -> int:
+        return len(getattr(self, self.FIELDS[0]))
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source, handler):
+        # From JSON, pydantic-core parses and checks the rows natively (as it would for List[Dict[str, Any]])
+        # and only then hands them over to be split into columns
+        rows = core_schema.list_schema(core_schema.dict_schema(core_schema.str_schema(), core_schema.any_schema()))
+        return core_schema.json_or_python_schema(
+            json_schema=core_schema.no_info_after_validator_function(cls.from_records, rows),
+            python_schema=core_schema.no_info_plain_validator_function(cls.from_records),
+            serialization=core_schema.plain_serializer_function_ser_schema(cls.to_records)
+        )
+
+    @classmethod
+    def __get_pydantic_json_schema__(cls, schema, handler):
+        return {"type": "array", "items": {"type": "object"}}
+
+
+def _normalized_names(column: Tuple[Any, ...]) -> Tuple[Tuple[Any, ...], Tuple[str, ...]]:
+    """
+    Returns the column with one shared copy of each repeated name, and its
+    lowercase form ("" for empty names), computing both once per distinct name.
+    """
+    intern = sys.intern
+    try:
+        distinct = set(column)
+    except TypeError: # Unhashable values
+        return column, tuple(intern(str(value).lower()) if value else "" for value in column)
+    shared = {value: intern(value) if type(value) is str else value for value in distinct}
+    lowered = {value: intern(str(value).lower()) if value else "" for value in distinct}
+    return tuple(map(shared.__getitem__, column)), tuple(map(lowered.__getitem__, column))
+
+
+def cmdline_text(cmdline: Any) -> Optional[str]:
+    """A command line as one string, whether it was sent as a string or as an argv list."""
+    if cmdline is None or type(cmdline) is str:
+        return cmdline
+    if isinstance(cmdline, list):
+        return " ".join(map(str, cmdline))
+    return str(cmdline)
+
+
+class ProcessTable(ColumnTable):
+    """The process list of a snapshot, one column per field."""
+    FIELDS = ("pid", "ppid", "name", "username", "cmdline")
+    __slots__ = FIELDS + ("name_lower", "cmdline_text")
+
+    def _derive(self):
+        # Process names repeat heavily (svchost.exe, chrome.exe, ...), so share one copy.
+        # A full lowercase cmdline copy would double the largest strings in the snapshot; rules that
+        # need one lowercase the few rows they match by name instead.
+        self.name, self.name_lower = _normalized_names(self.name)
+        # Command lines as strings for rules and baselines; the same tuple unless some were sent as lists
+        if set(map(type, self.cmdline)) <= {str, type(None)}:
+            self.cmdline_text = self.cmdline
+        else:
+            self.cmdline_text = tuple(map(cmdline_text, self.cmdline))
+
+
+class ConnectionTable(ColumnTable):
+    """The network connection list of a snapshot, one column per field."""
+    FIELDS = ("local_address", "remote_address", "status", "pid")
+    __slots__ = FIELDS